@@ -3,12 +3,16 @@ Booking models
 """
 
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel
+import numpy as np
+from dateutil import parser
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 
 class Vehicle(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     driver_name: Optional[str] = None
     capacity: int
@@ -23,15 +27,17 @@ class Vehicle(BaseModel):
 class Booking(BaseModel):
     """Booking model representing a single booking"""
 
+    model_config = ConfigDict(frozen=True)
+
     id: str
     client_name: str
 
-    pickup_time: Optional[str]  # H:mm AM format
+    pickup_time: Optional[str] = None  # H:mm AM format
     pickup_address: str
     pickup_latitude: float
     pickup_longitude: float
 
-    appointment_time: Optional[str]  # H:mm AM format
+    appointment_time: Optional[str] = None  # H:mm AM format
     dropoff_address: str
     dropoff_latitude: float
     dropoff_longitude: float
@@ -39,6 +45,15 @@ class Booking(BaseModel):
     passenger_count: int = 1
 
 
+def _check_date(value: str) -> str:
+    """Reject a request date that can't be parsed, so it is a 422 not a 500"""
+    try:
+        parser.parse(value)
+    except (ValueError, OverflowError):
+        raise ValueError(f'Invalid date: "{value}".')
+    return value
+
+
 class CarpoolConfig(BaseModel):
     """CarpoolConfig model representing the configurable options of carpooling"""
 
@@ -47,7 +62,10 @@ class CarpoolConfig(BaseModel):
     # True if pooling nearby pickups (not only on exactly same address)
     pool_neighbors: bool = False
     # How many map areas if pooling nearby pickups
-    geo_clusters: int = 8
+    geo_clusters: int = Field(8, ge=1)
+    # True to start geo clustering from the centers of the previous request,
+    # faster but the plan then depends on which request came before
+    warm_start_clusters: bool = False
 
 
 class CarpoolRequest(BaseModel):
@@ -58,16 +76,102 @@ class CarpoolRequest(BaseModel):
     vehicles: List[Vehicle]
     config: Optional[CarpoolConfig] = None
 
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        return _check_date(value)
+
+    def bookings_to_columns(self) -> Dict[str, Any]:
+        """Booking fields as columns, numeric fields as typed numpy arrays"""
+        n = len(self.bookings)
+        columns: Dict[str, Any] = {}
+        for name, field in Booking.model_fields.items():
+            values = (getattr(b, name) for b in self.bookings)
+            if field.annotation in (int, float):
+                columns[name] = np.fromiter(values, dtype=field.annotation, count=n)
+            else:
+                columns[name] = list(values)
+        return columns
+
+
+class CarpoolColumns(BaseModel):
+    """CarpoolColumns model representing bookings as one list per Booking field"""
+
+    id: List[str]
+    client_name: List[str]
+
+    pickup_time: Optional[List[Optional[str]]] = None  # H:mm AM format
+    pickup_address: List[str]
+    pickup_latitude: List[float]
+    pickup_longitude: List[float]
+
+    appointment_time: Optional[List[Optional[str]]] = None  # H:mm AM format
+    dropoff_address: List[str]
+    dropoff_latitude: List[float]
+    dropoff_longitude: List[float]
+
+    passenger_count: Optional[List[int]] = None
+
+    @model_validator(mode="after")
+    def check_lengths(self) -> "CarpoolColumns":
+        lengths = {
+            name: len(values)
+            for name in Booking.model_fields
+            if (values := getattr(self, name)) is not None
+        }
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"booking columns differ in length: {lengths}")
+        return self
+
+    def _values(self, name: str) -> list:
+        """Values of a column, the Booking default when the column is omitted"""
+        values = getattr(self, name)
+        if values is None:
+            return [Booking.model_fields[name].default] * len(self.id)
+        return values
+
+    def to_columns(self) -> Dict[str, Any]:
+        """Columns as bookings_to_columns builds them, numeric ones as numpy arrays"""
+        columns: Dict[str, Any] = {}
+        for name, field in Booking.model_fields.items():
+            if field.annotation in (int, float):
+                columns[name] = np.asarray(self._values(name), dtype=field.annotation)
+            else:
+                columns[name] = self._values(name)
+        return columns
+
+    def to_bookings(self) -> List[Booking]:
+        """Bookings row by row, the columns are already validated"""
+        names = list(Booking.model_fields)
+        rows = zip(*(self._values(name) for name in names))
+        return [Booking.model_construct(**dict(zip(names, row))) for row in rows]
+
+
+class CarpoolBatchRequest(BaseModel):
+    """CarpoolBatchRequest model representing the columnar json request"""
+
+    date: str  # MM/DD/YYYY format
+    bookings: CarpoolColumns
+    vehicles: List[Vehicle]
+    config: Optional[CarpoolConfig] = None
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        return _check_date(value)
+
+    def bookings_to_columns(self) -> Dict[str, Any]:
+        """Booking fields as columns, numeric fields as typed numpy arrays"""
+        return self.bookings.to_columns()
+
 
 class Trip(BaseModel):
     """Trip model representing a carpooling trip of a vehicle"""
 
     bookings: List[Booking]
     start_time: Optional[datetime] = None
-
-    @property
-    def total_passengers(self):
-        return sum(b.passenger_count for b in self.bookings)
+    # maintained incrementally as bookings are added to the trip
+    total_passengers: int = 0
 
 
 class VehiclePlan(BaseModel):
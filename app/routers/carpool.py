@@ -2,13 +2,18 @@
 CarPool PoC API routes
 """
 
+import logging
+from typing import Union
+
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 
-from app.models.carpool import CarpoolRequest, CarpoolResponse
+from app.models.carpool import CarpoolBatchRequest, CarpoolRequest, CarpoolResponse
 from app.services.carpool import calculate
 
 router = APIRouter()
+log = logging.getLogger(__name__)
 
 
 class OriginForbiddenError(Exception):
@@ -19,7 +24,7 @@ class OriginForbiddenError(Exception):
 
 def handle_error(error: Exception) -> JSONResponse:
     """Handle errors and return appropriate JSON response"""
-    print(f"Error: {error}")
+    log.exception("carpool error: %s", error)
 
     if isinstance(error, OriginForbiddenError):
         return JSONResponse(
@@ -35,13 +40,29 @@ def handle_error(error: Exception) -> JSONResponse:
     )
 
 
-@router.post("/carpool", response_model=CarpoolResponse)
-async def calculate_carpool(cluster_request: CarpoolRequest):
+async def _calculate_response(
+    cluster_request: Union[CarpoolRequest, CarpoolBatchRequest],
+) -> Response:
     try:
-        # print(cluster_request)
-        response = await calculate(cluster_request)
+        # calculate is CPU bound, keep it off the event loop
+        response = await run_in_threadpool(calculate, cluster_request)
 
-        return response
+        # serialize once with pydantic-core and hand back a raw Response, so
+        # FastAPI skips jsonable_encoder and re-validating the response model
+        return Response(
+            content=response.model_dump_json(), media_type="application/json"
+        )
 
     except Exception as e:
         return handle_error(e)
+
+
+@router.post("/carpool", response_model=CarpoolResponse)
+async def calculate_carpool(cluster_request: CarpoolRequest):
+    return await _calculate_response(cluster_request)
+
+
+@router.post("/carpool/batch", response_model=CarpoolResponse)
+async def calculate_carpool_batch(cluster_request: CarpoolBatchRequest):
+    """Same as /carpool, with bookings sent as one list per field"""
+    return await _calculate_response(cluster_request)
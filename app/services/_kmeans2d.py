@@ -0,0 +1,170 @@
+"""
+K-means specialized for 2-D points (latitude, longitude)
+
+Compiled with numba when it is installed; callers should check HAS_NUMBA and
+fall back to sklearn otherwise.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:  # numba is optional
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+
+@njit(cache=True, fastmath=True)
+def _seed_centers(xy: np.ndarray, k: int) -> np.ndarray:
+    """K-means++ seeding: pick each next center weighted by squared distance"""
+    n = xy.shape[0]
+    centers = np.empty((k, 2), dtype=np.float64)
+    first = np.random.randint(n)
+    centers[0, 0] = xy[first, 0]
+    centers[0, 1] = xy[first, 1]
+
+    dist = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        dx = xy[i, 0] - centers[0, 0]
+        dy = xy[i, 1] - centers[0, 1]
+        dist[i] = dx * dx + dy * dy
+
+    for c in range(1, k):
+        total = dist.sum()
+        if total <= 0.0:
+            pick = np.random.randint(n)
+        else:
+            target = np.random.random() * total
+            acc = 0.0
+            pick = n - 1
+            for i in range(n):
+                acc += dist[i]
+                if acc >= target:
+                    pick = i
+                    break
+        centers[c, 0] = xy[pick, 0]
+        centers[c, 1] = xy[pick, 1]
+        for i in range(n):
+            dx = xy[i, 0] - centers[c, 0]
+            dy = xy[i, 1] - centers[c, 1]
+            d = dx * dx + dy * dy
+            if d < dist[i]:
+                dist[i] = d
+    return centers
+
+
+@njit(cache=True, fastmath=True)
+def _nearest(x: float, y: float, centers: np.ndarray):
+    """Index of and squared distance to the center nearest to (x, y)"""
+    best_c = 0
+    best_d = np.inf
+    for c in range(centers.shape[0]):
+        dx = x - centers[c, 0]
+        dy = y - centers[c, 1]
+        d = dx * dx + dy * dy
+        if d < best_d:
+            best_d = d
+            best_c = c
+    return best_c, best_d
+
+
+# Serial on purpose: requests already run in a threadpool, and numba's parallel
+# backends do not cooperate with being launched from worker threads
+@njit(cache=True, fastmath=True)
+def _assign(
+    xy: np.ndarray, centers: np.ndarray, labels: np.ndarray, dist: np.ndarray
+) -> float:
+    """Label every point with its nearest center, returns the inertia"""
+    n = xy.shape[0]
+    for i in range(n):
+        labels[i], dist[i] = _nearest(xy[i, 0], xy[i, 1], centers)
+    return dist.sum()
+
+
+@njit(cache=True, fastmath=True)
+def _lloyd(xy: np.ndarray, centers: np.ndarray, max_iter: int):
+    """Lloyd iterations from the given centers, returns (labels, inertia)"""
+    n = xy.shape[0]
+    k = centers.shape[0]
+    labels = np.zeros(n, dtype=np.int64)
+    prev = np.full(n, -1, dtype=np.int64)
+    sums = np.empty((k, 2), dtype=np.float64)
+    counts = np.empty(k, dtype=np.int64)
+    dist = np.empty(n, dtype=np.float64)
+    inertia = _assign(xy, centers, labels, dist)
+
+    for _ in range(max_iter):
+        if (labels == prev).all():
+            break
+        prev[:] = labels
+
+        sums[:] = 0.0
+        counts[:] = 0
+        for i in range(n):
+            c = labels[i]
+            sums[c, 0] += xy[i, 0]
+            sums[c, 1] += xy[i, 1]
+            counts[c] += 1
+        for c in range(k):
+            if counts[c] > 0:
+                centers[c, 0] = sums[c, 0] / counts[c]
+                centers[c, 1] = sums[c, 1] / counts[c]
+            else:
+                # re-seed an empty cluster on the point farthest from its center
+                far = dist.argmax()
+                centers[c, 0] = xy[far, 0]
+                centers[c, 1] = xy[far, 1]
+                dist[far] = 0.0
+
+        inertia = _assign(xy, centers, labels, dist)
+    return labels, inertia
+
+
+@njit(cache=True)
+def kmeans_2d(xy: np.ndarray, k: int, n_init: int, max_iter: int, seed: int):
+    """
+    Cluster 2-D points with K-means++ seeding and Lloyd iterations
+
+    Args:
+        xy: (n, 2) array of points
+        k: Number of clusters, at most n
+        n_init: Number of seedings, the lowest-inertia run wins
+        max_iter: Maximum Lloyd iterations per run
+        seed: Random seed
+
+    Returns:
+        (n,) int64 array of cluster labels in [0, k) and (k, 2) final centers
+    """
+    np.random.seed(seed)
+    best_labels = np.zeros(xy.shape[0], dtype=np.int64)
+    best_centers = np.zeros((k, 2), dtype=np.float64)
+    best_inertia = np.inf
+    for _ in range(n_init):
+        centers = _seed_centers(xy, k)
+        labels, inertia = _lloyd(xy, centers, max_iter)
+        if inertia < best_inertia:
+            best_inertia = inertia
+            best_labels = labels
+            best_centers = centers
+    return best_labels, best_centers
+
+
+@njit(cache=True)
+def kmeans_2d_from(xy: np.ndarray, centers: np.ndarray, max_iter: int):
+    """
+    Cluster 2-D points with Lloyd iterations from the given initial centers
+
+    Args:
+        xy: (n, 2) array of points
+        centers: (k, 2) float64 initial centers, updated in place
+        max_iter: Maximum Lloyd iterations
+
+    Returns:
+        (n,) int64 array of cluster labels in [0, k) and (k, 2) final centers
+    """
+    labels, _ = _lloyd(xy, centers, max_iter)
+    return labels, centers
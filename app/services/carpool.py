@@ -1,11 +1,16 @@
-from datetime import timedelta
-from typing import Dict, List, Optional
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Union
 
+import numpy as np
 import pandas as pd
+from dateutil import parser
 from pandas import DataFrame
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
 from app.models.carpool import (
+    Booking,
+    CarpoolBatchRequest,
     CarpoolConfig,
     CarpoolRequest,
     CarpoolResponse,
@@ -13,78 +18,196 @@ from app.models.carpool import (
     Vehicle,
     VehiclePlan,
 )
-from app.utils.timeaddr import get_datetime_by_address
+from app.services._kmeans2d import HAS_NUMBA, kmeans_2d, kmeans_2d_from
+from app.utils.timeaddr import TIME_FORMATS, ZIPCODE_RE, get_timezone_id_by_zipcode
 
+log = logging.getLogger(__name__)
 
-async def calculate(request: CarpoolRequest) -> CarpoolResponse:
+# time values meaning "no fixed time", they are not parse errors
+_NO_TIME_VALUES = [None, "", "OPEN"]
+
+# inputs larger than this are clustered with mini-batch K-means
+_MINI_BATCH_MIN_SAMPLES = 5000
+# final centers of the last fit per n_clusters, warm-starts the next request
+_LAST_CENTERS: Dict[int, np.ndarray] = {}
+
+
+def calculate(
+    request: Union[CarpoolRequest, CarpoolBatchRequest],
+) -> CarpoolResponse:
     df = prepare_df(request)
     df = group_same_addresses(df)
     if request.config is None:
         request.config = CarpoolConfig()
     if request.config.pool_neighbors:
-        df = group_close_coordinates(df, request.config.geo_clusters)
+        df = group_close_coordinates(
+            df,
+            request.config.geo_clusters,
+            warm_start=request.config.warm_start_clusters,
+        )
     plan = assign_to_vehicle(df, request.vehicles, request.config.max_wait_minutes)
 
-    write_result_to_df(df, plan)
-    print("\n\n")
-    print(
-        df[
-            [
-                "id",
-                "client_name",
-                "pickup_time",
-                "cluster_id",
-                "group_key",
-                "vehicle_id",
-                "trip_id",
-            ]
-        ]
-    )
-    print("\n\n")
+    # the result frame is only used for debugging, skip building it otherwise
+    if log.isEnabledFor(logging.DEBUG):
+        write_result_to_df(df, plan)
+        log.debug(
+            "carpool plan:\n%s",
+            df[
+                [
+                    "id",
+                    "client_name",
+                    "pickup_time",
+                    "cluster_id",
+                    "group_key",
+                    "vehicle_id",
+                    "trip_id",
+                ]
+            ].to_string(),
+        )
 
-    return CarpoolResponse(date=request.date, plan=plan)
+    return CarpoolResponse.model_construct(date=request.date, plan=plan)
 
 
-def prepare_df(request: CarpoolRequest) -> DataFrame:
+def prepare_df(request: Union[CarpoolRequest, CarpoolBatchRequest]) -> DataFrame:
     """
     Prepare Dataframe with reuqest
 
     Converts raw data & time into full datetime fields.
     Retrieving only relevant information: Pick-up times, Appointment times (if exist),
     Pickup Latitude, Pickup Longitude
+
+    Rows are parsed independently: a malformed time or an unknown timezone
+    leaves NaT in that row only and flags it in the "pickup_parse_error" or
+    "appointment_parse_error" column. Bookings whose pickup time could not be
+    resolved are not pooled, each gets a trip of its own.
     """
 
-    df = pd.DataFrame([b.model_dump() for b in request.bookings])
-    df["raw"] = request.bookings
+    # build columns straight from attributes, no per-row model_dump() dicts
+    df = pd.DataFrame(request.bookings_to_columns())
+    if isinstance(request, CarpoolBatchRequest):
+        df["raw"] = request.bookings.to_bookings()
+    else:
+        df["raw"] = request.bookings
 
-    def safe_get_datetime(date, time_str, address):
-        try:
-            return get_datetime_by_address(date, str(time_str), str(address))
-        except Exception as e:
-            print("Failed:", time_str, address, "=>", e)
-            return None
+    # same parser as the request model validates the date with
+    base_date = pd.Timestamp(parser.parse(request.date)).normalize()
+    pickup_tz, dropoff_tz = _resolve_timezone_ids(
+        df["pickup_address"], df["dropoff_address"]
+    )
+    df["pickup_datetime"] = _to_local_datetimes(
+        base_date, df["pickup_time"], df["pickup_address"], pickup_tz
+    )
+    df["appointment_datetime"] = _to_local_datetimes(
+        base_date, df["appointment_time"], df["dropoff_address"], dropoff_tz
+    )
+    df["pickup_parse_error"] = (
+        ~df["pickup_time"].isin(_NO_TIME_VALUES) & df["pickup_datetime"].isna()
+    )
+    df["appointment_parse_error"] = (
+        ~df["appointment_time"].isin(_NO_TIME_VALUES)
+        & df["appointment_datetime"].isna()
+    )
+    if df["pickup_parse_error"].any():
+        log.warning(
+            "Bookings with unparseable pickup times, not pooled: %s",
+            df.loc[df["pickup_parse_error"], "id"].tolist(),
+        )
+    if df["appointment_parse_error"].any():
+        log.warning(
+            "Bookings with unparseable appointment times: %s",
+            df.loc[df["appointment_parse_error"], "id"].tolist(),
+        )
 
-    df_filtered = df[~df["pickup_time"].isin([None, "", "OPEN"])]
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(
+            "prepared bookings:\n%s",
+            df[["pickup_datetime", "appointment_datetime"]].to_string(),
+        )
 
-    df["pickup_datetime"] = df_filtered.apply(
-        lambda row: safe_get_datetime(
-            request.date, row["pickup_time"], row["pickup_address"]
-        ),
-        axis=1,
-    )
+    return df
 
-    df_filtered = df[~df["appointment_time"].isin([None, "", "OPEN"])]
 
-    df["appointment_datetime"] = df_filtered.apply(
-        lambda row: safe_get_datetime(
-            request.date, row["appointment_time"], row["dropoff_address"]
-        ),
-        axis=1,
-    )
+def _parse_time_of_day(time_str: str) -> Optional[datetime]:
+    try:
+        # the wall-clock time is local to the address, drop any zone dateutil saw
+        return parser.parse(time_str).replace(tzinfo=None)
+    except (ValueError, OverflowError):
+        return None
 
-    # print(df[["pickup_datetime", "appointment_datetime"]])
 
-    return df
+def _resolve_timezone_ids(*addresses: pd.Series) -> List[pd.Series]:
+    """
+    Timezone ID of every address, for each of the given address columns
+
+    Pickup and dropoff usually share zipcodes, so each distinct zipcode across
+    all columns is looked up only once.
+    """
+
+    # astype(object) keeps .str usable on columns of an empty request
+    zipcodes = [
+        a.astype(object).str.extract(ZIPCODE_RE, expand=False)
+        for a in addresses
+    ]
+    unique_zipcodes = pd.unique(pd.concat(zipcodes).dropna())
+    timezone_ids = {z: get_timezone_id_by_zipcode(z) for z in unique_zipcodes}
+    return [z.map(timezone_ids) for z in zipcodes]
+
+
+def _to_local_datetimes(
+    base_date: pd.Timestamp,
+    times: pd.Series,
+    addresses: pd.Series,
+    timezone_ids: pd.Series,
+) -> pd.Series:
+    """
+    Combine the request date with time strings in the timezone of each address
+
+    Times are parsed column-wise with explicit formats, only the leftovers go
+    through dateutil (once per distinct value). Missing, OPEN or unparseable
+    times, and addresses without a known timezone, result in NaT.
+    """
+
+    times = times.where(~times.isin(_NO_TIME_VALUES))
+    if times.isna().all():
+        return pd.Series(pd.NaT, index=times.index, dtype=object)
+
+    parsed = pd.Series(pd.NaT, index=times.index, dtype="datetime64[ns]")
+    for fmt in TIME_FORMATS:
+        todo = parsed.isna() & times.notna()
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(times[todo], format=fmt, errors="coerce")
+
+    todo = parsed.isna() & times.notna()
+    if todo.any():
+        leftovers = times[todo]
+        parsed_by_value = {t: _parse_time_of_day(t) for t in leftovers.unique()}
+        parsed[todo] = pd.to_datetime(leftovers.map(parsed_by_value))
+        failed = parsed.isna() & times.notna()
+        if failed.any():
+            log.warning("Could not parse time: %s", times[failed].unique().tolist())
+
+    local = base_date + (parsed - parsed.dt.normalize())
+
+    failed = local.notna() & timezone_ids.isna()
+    if failed.any():
+        log.warning(
+            "Could not get timezone ID for: %s", addresses[failed].unique().tolist()
+        )
+
+    groups = local[local.notna()].groupby(timezone_ids)
+    if groups.ngroups == 1:
+        timezone_id = next(iter(groups.groups))
+        return local.dt.tz_localize(
+            timezone_id, ambiguous=False, nonexistent="shift_forward"
+        ).where(timezone_ids.notna())
+
+    result = pd.Series(pd.NaT, index=local.index, dtype=object)
+    for timezone_id, group in groups:
+        result[group.index] = group.dt.tz_localize(
+            timezone_id, ambiguous=False, nonexistent="shift_forward"
+        ).astype(object)
+    return result
 
 
 def group_same_addresses(df: DataFrame) -> DataFrame:
@@ -93,50 +216,142 @@ def group_same_addresses(df: DataFrame) -> DataFrame:
 
     """
 
+    dropoff = df["dropoff_address"].to_numpy(dtype=object)
+    pickup = df["pickup_address"].to_numpy(dtype=object)
+    cluster_ids = np.full(len(df), -1, dtype=np.int64)
+    group_keys = np.full(len(df), None, dtype=object)
+
     # 1. count addresses
-    drop_counts = df["dropoff_address"].value_counts()
-    pickup_counts = df["pickup_address"].value_counts()
+    drop_counts = df.groupby("dropoff_address")["dropoff_address"].transform("size")
+    pickup_counts = df.groupby("pickup_address")["pickup_address"].transform("size")
 
     cluster_id = 1
 
     # 2. group same dropoff_address if has multiple entries
-    for addr, cnt in drop_counts.items():
-        if cnt > 1:
-            mask = df["dropoff_address"] == addr
-            df.loc[mask, "cluster_id"] = cluster_id
-            df.loc[mask, "group_key"] = "DROPOFF=" + addr
-            cluster_id += 1
+    mask = drop_counts.to_numpy() > 1
+    if mask.any():
+        groups = df[mask].groupby("dropoff_address")
+        cluster_ids[mask] = groups.ngroup().to_numpy() + cluster_id
+        group_keys[mask] = "DROPOFF=" + dropoff[mask]
+        cluster_id += groups.ngroups
 
     # 3. group same pickup_address if has multiple entries and not grouped yet
-    for addr, cnt in pickup_counts.items():
-        if cnt > 1:
-            mask = (df["cluster_id"].isna()) & (df["pickup_address"] == addr)
-            if mask.sum() > 0:
-                df.loc[mask, "cluster_id"] = cluster_id
-                df.loc[mask, "group_key"] = "PICKUP=" + addr
-                cluster_id += 1
+    mask = (cluster_ids < 0) & (pickup_counts.to_numpy() > 1)
+    if mask.any():
+        groups = df[mask].groupby("pickup_address")
+        cluster_ids[mask] = groups.ngroup().to_numpy() + cluster_id
+        group_keys[mask] = "PICKUP=" + pickup[mask]
 
-    # print(df[["client_name", "cluster_id"]])
+    df["cluster_id"] = np.where(cluster_ids >= 0, cluster_ids, np.nan)
+    df["group_key"] = group_keys
 
     return df
 
 
+def _kmeans_n_init(n_clusters: int, n_samples: int) -> int:
+    """Number of K-means++ seedings for full-batch K-means"""
+    return 1 if n_samples < 4 * n_clusters else 3
+
+
+def _make_kmeans(
+    n_clusters: int,
+    n_samples: int,
+    batch_size: int,
+    max_iter: int,
+    random_state: Optional[int],
+    init: Optional[np.ndarray] = None,
+) -> Union[KMeans, MiniBatchKMeans]:
+    """
+    Build the K-means estimator for this input size
+
+    Estimators are stateful once fitted, so each call gets its own and
+    concurrent requests can fit in parallel. With init centers a single
+    init refines the given centers.
+    """
+    if n_samples > _MINI_BATCH_MIN_SAMPLES:
+        return MiniBatchKMeans(
+            n_clusters=n_clusters,
+            init="k-means++" if init is None else init,
+            batch_size=batch_size,
+            n_init=3 if init is None else 1,
+            max_iter=max_iter,
+            random_state=random_state,
+        )
+    return KMeans(
+        n_clusters=n_clusters,
+        init="k-means++" if init is None else init,
+        n_init=_kmeans_n_init(n_clusters, n_samples) if init is None else 1,
+        max_iter=max_iter,
+        algorithm="elkan",
+        random_state=random_state,
+        # coords are a private float32 copy, center them in place
+        copy_x=False,
+    )
+
+
+def _within_bounds(centers: np.ndarray, coords: np.ndarray) -> bool:
+    """True if all centers lie within the bounding box of coords"""
+    return bool(
+        (centers >= coords.min(axis=0)).all() and (centers <= coords.max(axis=0)).all()
+    )
+
+
+def _fit_kmeans(
+    coords: np.ndarray,
+    n_clusters: int,
+    batch_size: int,
+    max_iter: int,
+    random_state: Optional[int],
+    init: Optional[np.ndarray] = None,
+):
+    """K-means labels and final centers, from K-means++ or the given centers"""
+    n_samples = len(coords)
+    if HAS_NUMBA and n_samples <= _MINI_BATCH_MIN_SAMPLES:
+        # specialized 2-D kernel, no sklearn overhead
+        if init is not None:
+            return kmeans_2d_from(coords, init.copy(), max_iter)
+        if random_state is None:
+            random_state = np.random.randint(2**31)
+        n_init = _kmeans_n_init(n_clusters, n_samples)
+        return kmeans_2d(coords, n_clusters, n_init, max_iter, random_state)
+
+    kmeans = _make_kmeans(
+        n_clusters, n_samples, batch_size, max_iter, random_state, init
+    )
+    labels = kmeans.fit_predict(coords)
+    return labels, kmeans.cluster_centers_
+
+
 def group_close_coordinates(
     df: DataFrame,
     n_clusters=8,
-    init="k-means++",
-    n_init="auto",
-    max_iter=300,
-    verbose=0,
-    random_state=None,
-    algorithm="lloyd",
+    batch_size=256,
+    max_iter=100,
+    random_state=0,
+    warm_start=False,
 ) -> DataFrame:
     """
     Group bookings geographically based on their pickup coordinates with K-means++
+
+    Up to a few thousand points run full-batch K-means, with the numba 2-D
+    kernel when numba is installed, else sklearn's elkan algorithm whose
+    triangle inequality bounds skip most distance computations in 2-D;
+    tiny inputs get a single init, others 3. Larger inputs use mini-batch
+    K-means, which converges in a fraction of the iterations.
+
+    With warm_start, the centers of the previous fit with the same n_clusters
+    seed a single Lloyd refinement instead of the K-means++ inits, as long as
+    they lie within the bounding box of the current points. If the refinement
+    leaves a cluster empty, the points are clustered from scratch.
     """
 
+    # the numba kernel does no bounds checking, so reject this up front
+    if n_clusters < 1:
+        raise ValueError(f"n_clusters must be at least 1, got {n_clusters}")
+
     # 1. operate only 'cluster_id' is NA
-    mask = df["cluster_id"].isna()
+    cluster_ids = df["cluster_id"].to_numpy(dtype=np.float64, copy=True)
+    mask = np.isnan(cluster_ids)
     df_na = df[mask]
     if df_na.empty:
         return df
@@ -145,112 +360,122 @@ def group_close_coordinates(
         return df
 
     # 2. find max of cluster_id as the KMeans output start index
-    if df["cluster_id"].dropna().empty:
+    if mask.all():
         start = 1
     else:
-        start = int(df["cluster_id"].dropna().max()) + 1
+        start = int(np.nanmax(cluster_ids)) + 1
 
     # 3. KMeans clustering on coordinates
-    coords = df_na[["pickup_latitude", "pickup_longitude"]]
-    kmeans = KMeans(
-        n_clusters=n_clusters,
-        init=init,
-        n_init=n_init,
-        max_iter=max_iter,
-        verbose=verbose,
-        random_state=random_state,
-        algorithm=algorithm,
+    coords = np.ascontiguousarray(
+        df_na[["pickup_latitude", "pickup_longitude"]].to_numpy(dtype=np.float32)
     )
-    labels = kmeans.fit_predict(coords)
+    init = _LAST_CENTERS.get(n_clusters) if warm_start else None
+    if init is not None and not _within_bounds(init, coords):
+        init = None
+
+    labels = centers = None
+    if init is not None:
+        labels, centers = _fit_kmeans(
+            coords, n_clusters, batch_size, max_iter, random_state, init
+        )
+        if len(np.unique(labels)) < n_clusters:
+            labels = None
+    if labels is None:
+        labels, centers = _fit_kmeans(
+            coords, n_clusters, batch_size, max_iter, random_state
+        )
+    if warm_start:
+        _LAST_CENTERS[n_clusters] = np.array(centers, dtype=np.float64)
 
     # 4. write back to df['cluster_id']
-    df.loc[mask, "cluster_id"] = labels + start
-    df.loc[mask, "group_key"] = "GEO-" + labels.astype(str)
-
-    # print(df[["pickup_latitude", "pickup_longitude", "cluster_id"]])
+    group_keys = df["group_key"].to_numpy(dtype=object, copy=True)
+    cluster_ids[mask] = labels + start
+    group_keys[mask] = "GEO-" + labels.astype(str)
+    df["cluster_id"] = cluster_ids
+    df["group_key"] = group_keys
 
     return df
 
 
-def _find_vehicle_idx_with_less_trips(
-    vehicles: List[Vehicle], result: Dict[Vehicle, List[Trip]]
-) -> int:
-    min = 999999999
-    for i, v in enumerate(vehicles):
-        if not result.get(v):
-            return i
-        trips = result.get(v)
-        if len(trips) < min:
-            min = len(trips)
-            min_idx = i
-    return min_idx
+def _add_booking(trip: Trip, booking: Booking) -> None:
+    trip.bookings.append(booking)
+    trip.total_passengers += booking.passenger_count
+
+
+def _find_vehicle_idx_with_less_trips(trips_per_vehicle: List[List[Trip]]) -> int:
+    return min(range(len(trips_per_vehicle)), key=lambda i: len(trips_per_vehicle[i]))
 
 
 def assign_bookings_to_vehicles(
     df: DataFrame,
-    vehicles: List[Vehicle],
-    result: Dict[Vehicle, List[Trip]],
+    capacities: np.ndarray,
+    trips_per_vehicle: List[List[Trip]],
     max_wait_minutes: int,
-):
-    # print("assign_bookings_to_vehicles", len(df))
+) -> None:
+    """assign bookings of one cluster, appending trips to trips_per_vehicle in place
+
+    df must carry the "pickup_ns" column computed by assign_to_vehicle.
+    """
     # 1. divide into df with pickup_datetime (sort by time) and no pickup_datetime (OPEN)
-    df_has_pickup = (
-        df[df["pickup_datetime"].notna()].sort_values("pickup_datetime").copy()
-    )
-    df_no_pickup = df[df["pickup_datetime"].isna()].copy()
+    has_pickup = df["pickup_datetime"].notna()
+    df_has_pickup = df[has_pickup].sort_values("pickup_ns", kind="stable")
+    df_no_pickup = df[~has_pickup]
 
     # 2. Greedy grouping for bookings has pickup_time
-    idx_vehicle = _find_vehicle_idx_with_less_trips(vehicles, result)
-    current_vehicle = vehicles[idx_vehicle]
+    idx_vehicle = _find_vehicle_idx_with_less_trips(trips_per_vehicle)
     current_trip: Optional[Trip] = None
 
     def close_current_vehicle():
         # close current vehicle and round robin to the next vehicle
-        nonlocal current_trip, idx_vehicle, current_vehicle, result
+        nonlocal current_trip, idx_vehicle
 
         if current_trip:
-            result[current_vehicle].append(current_trip)
-            idx_vehicle = (idx_vehicle + 1) % len(vehicles)
-            current_vehicle = vehicles[idx_vehicle]
+            trips_per_vehicle[idx_vehicle].append(current_trip)
+            idx_vehicle = (idx_vehicle + 1) % len(capacities)
         current_trip = None
 
-    for _, row in df_has_pickup.iterrows():
-        if not current_trip:
-            # start from empty
-            current_trip = Trip(
-                bookings=[row["raw"]],
-                start_time=row["pickup_datetime"],
-            )
-
-        elif (
-            row["pickup_datetime"] - current_trip.start_time
-            <= timedelta(minutes=max_wait_minutes)
-            and current_vehicle.capacity
-            >= current_trip.total_passengers + row["passenger_count"]
+    pickup_datetimes = df_has_pickup["pickup_datetime"].tolist()
+    # epoch nanoseconds as python ints, the time window check is int arithmetic
+    times = df_has_pickup["pickup_ns"].tolist()
+    raws = df_has_pickup["raw"].tolist()
+    passenger_counts = df_has_pickup["passenger_count"].tolist()
+    max_wait = max_wait_minutes * 60 * 1_000_000_000
+    trip_start = None
+
+    for i in range(len(raws)):
+        if (
+            current_trip
+            and times[i] - trip_start <= max_wait
+            and capacities[idx_vehicle]
+            >= current_trip.total_passengers + passenger_counts[i]
         ):
             # check time window and capacity
-            current_trip.bookings.append(row["raw"])
-
-        else:
-            # start a new trip
-            close_current_vehicle()
-            current_trip = Trip(
-                bookings=[row["raw"]],
-                start_time=row["pickup_datetime"],
-            )
+            _add_booking(current_trip, raws[i])
+            continue
+
+        # start a new trip
+        close_current_vehicle()
+        current_trip = Trip.model_construct(
+            bookings=[raws[i]],
+            start_time=pickup_datetimes[i],
+            total_passengers=passenger_counts[i],
+        )
+        trip_start = times[i]
 
     close_current_vehicle()
 
     # 3. Fill bookings without pickup_time
 
-    for _, row in df_no_pickup.iterrows():
+    for raw, passenger_count in zip(
+        df_no_pickup["raw"].tolist(), df_no_pickup["passenger_count"].tolist()
+    ):
         placed = False
 
         # try exist trips first
-        for v in vehicles:
-            for trip in result[v]:
-                if v.capacity >= trip.total_passengers + row["passenger_count"]:
-                    trip.bookings.append(row["raw"])
+        for capacity, trips in zip(capacities, trips_per_vehicle):
+            for trip in trips:
+                if capacity >= trip.total_passengers + passenger_count:
+                    _add_booking(trip, raw)
                     placed = True
                     break
             if placed:
@@ -258,21 +483,26 @@ def assign_bookings_to_vehicles(
 
         if not placed:
             # start a new trip on current vehicle
-            current_trip = Trip(
-                bookings=[row["raw"]],
+            current_trip = Trip.model_construct(
+                bookings=[raw],
+                total_passengers=passenger_count,
             )
             close_current_vehicle()
 
 
 def write_result_to_df(df: DataFrame, plan: List[VehiclePlan]) -> DataFrame:
+    vehicle_ids = {}
+    trip_ids = {}
     for vp in plan:
         vehicle = vp.vehicle
         trips = vp.trips
         for trip_id, trip in enumerate(trips):
             for b in trip.bookings:
-                mask = df["id"] == b.id
-                df.loc[mask, "vehicle_id"] = vehicle.id
-                df.loc[mask, "trip_id"] = trip_id
+                vehicle_ids[b.id] = vehicle.id
+                trip_ids[b.id] = trip_id
+
+    df["vehicle_id"] = df["id"].map(vehicle_ids)
+    df["trip_id"] = df["id"].map(trip_ids)
 
     df.sort_values(["vehicle_id", "trip_id", "pickup_datetime"], inplace=True)
     df.reset_index(inplace=True)
@@ -289,35 +519,50 @@ def assign_to_vehicle(
 ) -> List[VehiclePlan]:
     """assign bookings to vehicles"""
 
-    result: Dict[Vehicle, List[Trip]] = {}
-    for vehicle in vehicles:
-        result[vehicle] = []
-
     # 1. sort vehicles by capacity
     vehicles = sorted(vehicles, key=lambda v: -v.capacity)
+    capacities = np.fromiter(
+        (v.capacity for v in vehicles), dtype=np.int32, count=len(vehicles)
+    )
+    trips_per_vehicle: List[List[Trip]] = [[] for _ in vehicles]
 
     # 2. assign clustered bookings as multi-load trips
-    df_clustered = df[df["cluster_id"].notna()]
-
-    # print("df_clustered", len(df_clustered))
+    # take only the columns the assignment reads, so the per-cluster frames
+    # below don't copy the rest of the booking columns
+    # a booking whose time could not be parsed can't be checked against the
+    # time window, so it is never pooled
+    is_clustered = df["cluster_id"].notna() & ~df["pickup_parse_error"]
+    df_clustered = df.loc[
+        is_clustered, ["cluster_id", "pickup_datetime", "raw", "passenger_count"]
+    ]
+    # convert pickup times to UTC epoch nanoseconds once for all clusters
+    df_clustered = df_clustered.assign(
+        pickup_ns=pd.to_datetime(df_clustered["pickup_datetime"], utc=True)
+        .to_numpy(dtype="datetime64[ns]")
+        .view(np.int64)
+    )
 
-    for cluster_id in df_clustered["cluster_id"].unique():
-        cluster_df = df_clustered[df_clustered["cluster_id"] == cluster_id].copy()
-        # print(cluster_df[["client_name", "cluster_id", "pickup_datetime"]])
-        assign_bookings_to_vehicles(cluster_df, vehicles, result, max_wait_minutes)
+    for _, cluster_df in df_clustered.groupby("cluster_id", sort=False):
+        assign_bookings_to_vehicles(
+            cluster_df, capacities, trips_per_vehicle, max_wait_minutes
+        )
 
     # 3. assign non-clustered bookings as single-load trips
-    df_non_clustered = df[df["cluster_id"].isna()].sort_values("passenger_count")
+    df_non_clustered = df.loc[~is_clustered, ["raw", "passenger_count"]].sort_values(
+        "passenger_count"
+    )
 
-    idx_vehicle = _find_vehicle_idx_with_less_trips(vehicles, result)
-    current_vehicle = vehicles[idx_vehicle]
+    idx_vehicle = _find_vehicle_idx_with_less_trips(trips_per_vehicle)
 
-    for _, row in df_non_clustered.iterrows():
-        current_trip = Trip(
-            bookings=[row["raw"]],
+    for raw in df_non_clustered["raw"].tolist():
+        current_trip = Trip.model_construct(
+            bookings=[raw],
+            total_passengers=raw.passenger_count,
         )
-        result[current_vehicle].append(current_trip)
+        trips_per_vehicle[idx_vehicle].append(current_trip)
         idx_vehicle = (idx_vehicle + 1) % len(vehicles)
-        current_vehicle = vehicles[idx_vehicle]
 
-    return [VehiclePlan(vehicle=v, trips=t) for v, t in result.items()]
+    return [
+        VehiclePlan.model_construct(vehicle=v, trips=trips_per_vehicle[i])
+        for i, v in enumerate(vehicles)
+    ]
@@ -2,32 +2,34 @@
 Timezone and address utilities
 """
 
+import bisect
 import json
 import os
+import re
 from datetime import datetime
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import pytz
 from dateutil import parser
 
-# Load timezone mapping data
-_timezone_mapping: Optional[list] = None
+# Trailing ZIP or ZIP+4 of an address, the 5-digit ZIP is captured
+ZIPCODE_RE = re.compile(r"(\d{5})(?:-\d{4})?\s*$")
 
 
 def _load_timezone_mapping() -> list:
-    """(Lazy) Load timezone mapping from JSON file"""
-    global _timezone_mapping
-    if _timezone_mapping is None:
-        current_dir = os.path.dirname(__file__)
-        json_path = os.path.join(current_dir, "timezone_mapper.json")
-        with open(json_path, "r") as f:
-            _timezone_mapping = json.load(f)
-    return _timezone_mapping
+    """Load timezone mapping from JSON file"""
+    current_dir = os.path.dirname(__file__)
+    json_path = os.path.join(current_dir, "timezone_mapper.json")
+    with open(json_path, "r") as f:
+        return json.load(f)
 
 
 class TimezoneEntry:
     """Timezone mapping entry"""
 
+    __slots__ = ("state_code", "state", "zipcode_start", "zipcode_end", "timezone_id")
+
     def __init__(self, data: Dict[str, Any]):
         self.state_code = data["stateCode"]
         self.state = data["state"]
@@ -36,6 +38,59 @@ class TimezoneEntry:
         self.timezone_id = data["timezoneId"]
 
 
+def _build_zipcode_index(
+    entries: Tuple[TimezoneEntry, ...],
+) -> Tuple[List[int], List[Optional[TimezoneEntry]]]:
+    """
+    Build the zipcode index for binary search
+
+    Ranges in the mapping overlap, so they are split into disjoint segments at
+    every range boundary. Each segment keeps the first entry (in file order)
+    covering it, which is what a linear scan of the mapping would return.
+    """
+    bounds = sorted(
+        {e.zipcode_start for e in entries} | {e.zipcode_end + 1 for e in entries}
+    )
+    owners = [
+        next(
+            (e for e in entries if e.zipcode_start <= b <= e.zipcode_end),
+            None,
+        )
+        for b in bounds
+    ]
+    return bounds, owners
+
+
+# Timezone mapping, loaded once at import so no request pays for the JSON parse
+_TZ_ENTRIES: Tuple[TimezoneEntry, ...] = tuple(
+    TimezoneEntry(data) for data in _load_timezone_mapping()
+)
+# Sorted zipcode segment starts and the entry covering each segment
+_ZIPCODE_BOUNDS, _ZIPCODE_OWNERS = _build_zipcode_index(_TZ_ENTRIES)
+
+
+# Formats tried with strptime before falling back to dateutil
+_DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d", "%B %d, %Y")
+# Time formats, shared with the column-wise parsing in the carpool service
+TIME_FORMATS = ("%H:%M:%S", "%H:%M", "%I:%M %p", "%I:%M%p")
+
+
+@lru_cache(maxsize=64)
+def _tz(timezone_id: str):
+    """Cached pytz timezone"""
+    return pytz.timezone(timezone_id)
+
+
+def _parse(value: str, formats: Tuple[str, ...]) -> datetime:
+    """Parse with the expected strptime formats first, dateutil otherwise"""
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return parser.parse(value)
+
+
 def get_datetime_by_address(date_str: str, time_str: str, address: str) -> datetime:
     """
     Get datetime object from date string, time string, and address
@@ -77,19 +132,16 @@ def get_datetime_by_timezone_id(
     """
     try:
         # Parse date string
-        date_part = parser.parse(date_str)
+        date_part = _parse(date_str, _DATE_FORMATS)
         if not date_part:
             raise ValueError(f'Invalid dateStr: "{date_str}".')
 
-        time_part = parser.parse(time_str)
+        time_part = _parse(time_str, TIME_FORMATS)
         if not time_part:
             raise ValueError(f'Invalid timeStr: "{time_str}".')
 
-        # print(date_part)
-        # print(time_part)
-
         # Create timezone-aware datetime
-        tz = pytz.timezone(timezone_id)
+        tz = _tz(timezone_id)
 
         # Combine date and time
         local_dt = tz.localize(
@@ -103,8 +155,6 @@ def get_datetime_by_timezone_id(
             )
         )
 
-        # print(local_dt)
-
         return local_dt
 
     except Exception as e:
@@ -123,10 +173,11 @@ def get_timezone_id_by_address(address: str) -> Optional[str]:
     Returns:
         Timezone ID or None if not found
     """
-    # Extract zipcode from address (last part)
-    address_parts = address.split(" ")
-    zipcode = address_parts[-1]
-    return get_timezone_id_by_zipcode(zipcode)
+    # Extract zipcode from the end of the address, ZIP+4 included
+    match = ZIPCODE_RE.search(address)
+    if not match:
+        return None
+    return get_timezone_id_by_zipcode(match.group(1))
 
 
 def format_full_address_line(street: str, city: str, zipcode: str) -> str:
@@ -189,6 +240,7 @@ def _get_state_code(zipcode: str) -> Optional[str]:
     return None
 
 
+@lru_cache(maxsize=4096)
 def _lookup_zipcode(zipcode_str: str) -> Optional[TimezoneEntry]:
     """
     Look up zipcode in timezone mapping
@@ -204,10 +256,7 @@ def _lookup_zipcode(zipcode_str: str) -> Optional[TimezoneEntry]:
     except (ValueError, TypeError):
         return None
 
-    mapping = _load_timezone_mapping()
-    for entry_data in mapping:
-        entry = TimezoneEntry(entry_data)
-        if entry.zipcode_start <= zipcode <= entry.zipcode_end:
-            return entry
-
-    return None
+    idx = bisect.bisect_right(_ZIPCODE_BOUNDS, zipcode) - 1
+    if idx < 0:
+        return None
+    return _ZIPCODE_OWNERS[idx]
@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.carpool import Booking
+from main import app
+
+EXAMPLE_REQUEST = Path(__file__).parent.parent / "example_request.json"
+BOOKING_FIELDS = list(Booking.model_fields)
+OPTIONAL_FIELDS = ("pickup_time", "appointment_time", "passenger_count")
+REQUIRED_FIELDS = [f for f in BOOKING_FIELDS if f not in OPTIONAL_FIELDS]
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def example_request():
+    with open(EXAMPLE_REQUEST) as f:
+        return json.load(f)
+
+
+def test_rejects_zero_geo_clusters(client, example_request):
+    example_request["config"]["geo_clusters"] = 0
+
+    response = client.post("/api/v1/carpool", json=example_request)
+
+    assert response.status_code == 422
+
+
+def _to_columns(bookings, fields):
+    return {
+        name: [b.get(name, Booking.model_fields[name].default) for b in bookings]
+        for name in fields
+    }
+
+
+def test_batch_matches_row_wise(client, example_request):
+    columns = _to_columns(example_request["bookings"], BOOKING_FIELDS)
+    batch_request = dict(example_request, bookings=columns)
+
+    row_wise = client.post("/api/v1/carpool", json=example_request)
+    batch = client.post("/api/v1/carpool/batch", json=batch_request)
+
+    assert row_wise.status_code == batch.status_code == 200
+    assert batch.json() == row_wise.json()
+
+
+def test_batch_rejects_columns_of_different_length(client, example_request):
+    columns = _to_columns(example_request["bookings"], BOOKING_FIELDS)
+    columns["id"] = columns["id"][:-1]
+
+    response = client.post(
+        "/api/v1/carpool/batch", json=dict(example_request, bookings=columns)
+    )
+
+    assert response.status_code == 422
+
+
+def test_batch_optional_columns_take_booking_defaults(client, example_request):
+    bookings = example_request["bookings"][:3]
+    columns = _to_columns(bookings, REQUIRED_FIELDS)
+
+    response = client.post(
+        "/api/v1/carpool/batch",
+        json=dict(example_request, bookings=columns),
+    )
+
+    assert response.status_code == 200
+    planned = [
+        booking
+        for vehicle_plan in response.json()["plan"]
+        for trip in vehicle_plan["trips"]
+        for booking in trip["bookings"]
+    ]
+    assert sorted(b["id"] for b in planned) == sorted(b["id"] for b in bookings)
+    for booking in planned:
+        assert booking["pickup_time"] is None
+        assert booking["appointment_time"] is None
+        assert booking["passenger_count"] == 1
+
+
+def test_empty_batch(client, example_request):
+    columns = {name: [] for name in REQUIRED_FIELDS}
+
+    response = client.post(
+        "/api/v1/carpool/batch", json=dict(example_request, bookings=columns)
+    )
+
+    assert response.status_code == 200
+    assert all(not vp["trips"] for vp in response.json()["plan"])
+
+
+@pytest.mark.parametrize("path", ["/api/v1/carpool", "/api/v1/carpool/batch"])
+def test_rejects_malformed_date(client, example_request, path):
+    if path.endswith("batch"):
+        columns = _to_columns(example_request["bookings"], BOOKING_FIELDS)
+        example_request["bookings"] = columns
+    example_request["date"] = "not a date"
+
+    response = client.post(path, json=example_request)
+
+    assert response.status_code == 422
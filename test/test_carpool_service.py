@@ -0,0 +1,171 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.models.carpool import CarpoolRequest
+from app.services import carpool as service
+
+EXAMPLE_REQUEST = Path(__file__).parent.parent / "example_request.json"
+BASE_DATE = pd.Timestamp("2025-12-16")
+SAN_JOSE = "1 Main St, San Jose, CA 95128"
+NEW_YORK = "1 Broadway, New York, NY 10004"
+
+
+@pytest.fixture
+def example_request():
+    with open(EXAMPLE_REQUEST) as f:
+        return json.load(f)
+
+
+@pytest.fixture(autouse=True)
+def clear_warm_start_centers():
+    service._LAST_CENTERS.clear()
+    yield
+    service._LAST_CENTERS.clear()
+
+
+def _geo_clusters(data, n_clusters=8, warm_start=False):
+    df = service.group_same_addresses(service.prepare_df(CarpoolRequest(**data)))
+    df = service.group_close_coordinates(df, n_clusters, warm_start=warm_start)
+    return df["group_key"][df["group_key"].str.startswith("GEO-", na=False)]
+
+
+def _moved(data, dlat, dlon):
+    for booking in data["bookings"]:
+        booking["pickup_latitude"] += dlat
+        booking["pickup_longitude"] += dlon
+    return data
+
+
+def test_warm_start_from_a_different_area_keeps_all_clusters(example_request):
+    cold = _geo_clusters(_moved(json.loads(json.dumps(example_request)), 2, 3))
+
+    _geo_clusters(example_request, warm_start=True)
+    warm = _geo_clusters(_moved(example_request, 2, 3), warm_start=True)
+
+    assert warm.nunique() == cold.nunique() == 8
+
+
+def test_cold_start_does_not_depend_on_previous_request(example_request):
+    first = _geo_clusters(json.loads(json.dumps(example_request)))
+    _geo_clusters(_moved(json.loads(json.dumps(example_request)), 2, 3))
+    again = _geo_clusters(example_request)
+
+    assert first.tolist() == again.tolist()
+    assert not service._LAST_CENTERS
+
+
+def _local(times, addresses):
+    times = pd.Series(times, dtype=object)
+    addresses = pd.Series(addresses, dtype=object)
+    (timezone_ids,) = service._resolve_timezone_ids(addresses)
+    return service._to_local_datetimes(BASE_DATE, times, addresses, timezone_ids)
+
+
+def test_parses_mixed_time_formats():
+    result = _local(
+        ["13:05", "13:05:00", "1:05 PM", "1:05PM", "1:05 p.m."], [SAN_JOSE] * 5
+    )
+
+    expected = pd.Timestamp("2025-12-16 13:05", tz="America/Los_Angeles")
+    assert (result == expected).all()
+
+
+def test_open_and_missing_times_are_nat():
+    result = _local(["OPEN", None, ""], [SAN_JOSE] * 3)
+
+    assert result.isna().all()
+
+
+def test_unknown_zipcode_is_nat():
+    result = _local(
+        ["09:30"] * 3, [SAN_JOSE, "1 Nowhere, XX 00000", "somewhere without a zip"]
+    )
+
+    assert result.notna().tolist() == [True, False, False]
+
+
+def test_bad_row_does_not_affect_good_rows():
+    result = _local(["09:30", "garbage", "25:99", "10:45 AM"], [SAN_JOSE] * 4)
+
+    assert result.notna().tolist() == [True, False, False, True]
+    assert result[3] == pd.Timestamp("2025-12-16 10:45", tz="America/Los_Angeles")
+
+
+def test_zone_in_time_string_is_ignored():
+    result = _local(["09:30", "10:00 UTC"], [SAN_JOSE] * 2)
+
+    assert result[1] == pd.Timestamp("2025-12-16 10:00", tz="America/Los_Angeles")
+
+
+def test_times_are_local_to_each_address():
+    result = _local(["09:30", "09:30", "OPEN"], [SAN_JOSE, NEW_YORK, NEW_YORK])
+
+    assert result[0] == pd.Timestamp("2025-12-16 09:30", tz="America/Los_Angeles")
+    assert result[1] == pd.Timestamp("2025-12-16 09:30", tz="America/New_York")
+    assert pd.isna(result[2])
+
+
+def _trip_sizes(response):
+    return {
+        booking.id: len(trip.bookings)
+        for vehicle_plan in response.plan
+        for trip in vehicle_plan.trips
+        for booking in trip.bookings
+    }
+
+
+def test_bookings_with_unparseable_times_are_not_pooled(example_request, caplog):
+    trip_sizes = _trip_sizes(service.calculate(CarpoolRequest(**example_request)))
+    pooled = next(
+        b
+        for b in example_request["bookings"]
+        if b.get("pickup_time") not in (None, "", "OPEN") and trip_sizes[b["id"]] > 1
+    )
+
+    pooled["pickup_time"] = "garbage"
+    response = service.calculate(CarpoolRequest(**example_request))
+
+    trip_sizes = _trip_sizes(response)
+    assert trip_sizes[pooled["id"]] == 1
+    assert len(trip_sizes) == len(example_request["bookings"])
+    assert pooled["id"] in caplog.text
+
+
+def _trip_ids(response):
+    return [
+        [booking.id for booking in trip.bookings]
+        for vehicle_plan in response.plan
+        for trip in vehicle_plan.trips
+    ]
+
+
+@pytest.mark.parametrize("pool_neighbors", [False, True])
+def test_unparseable_appointment_times_do_not_change_the_plan(
+    example_request, pool_neighbors, caplog
+):
+    example_request["config"]["pool_neighbors"] = pool_neighbors
+    expected = _trip_ids(service.calculate(CarpoolRequest(**example_request)))
+
+    bad = example_request["bookings"][:40]
+    for booking in bad:
+        booking["appointment_time"] = "TBD"
+    response = service.calculate(CarpoolRequest(**example_request))
+
+    assert _trip_ids(response) == expected
+    assert bad[0]["id"] in caplog.text
+
+
+def test_dateutil_fallback_runs_once_per_distinct_value(monkeypatch):
+    calls = []
+    parse = service._parse_time_of_day
+    monkeypatch.setattr(
+        service, "_parse_time_of_day", lambda t: calls.append(t) or parse(t)
+    )
+
+    result = _local(["1:05 p.m."] * 50 + ["2 pm"] * 10, [SAN_JOSE] * 60)
+
+    assert sorted(calls) == ["1:05 p.m.", "2 pm"]
+    assert result.notna().all()
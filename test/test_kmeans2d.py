@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+
+from app.services._kmeans2d import kmeans_2d
+from app.services.carpool import group_close_coordinates
+
+
+def _blobs(n_per_blob=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.array([[37.0, -122.0], [37.5, -121.5], [36.5, -121.0], [38.0, -122.5]])
+    points = np.concatenate(
+        [c + rng.normal(0.0, 0.02, size=(n_per_blob, 2)) for c in centers]
+    )
+    return np.ascontiguousarray(points, dtype=np.float32)
+
+
+def _inertia(xy, labels, k):
+    return sum(
+        ((xy[labels == c] - xy[labels == c].mean(axis=0)) ** 2).sum()
+        for c in range(k)
+        if (labels == c).any()
+    )
+
+
+def test_matches_sklearn_partition_and_inertia():
+    xy = _blobs()
+    labels, centers = kmeans_2d(xy, 4, 3, 100, 0)
+    reference = KMeans(n_clusters=4, n_init=3, random_state=0).fit(xy)
+
+    assert labels.dtype == np.int64
+    assert centers.shape == (4, 2)
+    assert adjusted_rand_score(labels, reference.labels_) == 1.0
+    assert _inertia(xy, labels, 4) == pytest.approx(reference.inertia_, rel=1e-4)
+
+
+def test_k_equals_n_puts_every_point_in_its_own_cluster():
+    xy = _blobs(n_per_blob=2)
+    labels, _ = kmeans_2d(xy, len(xy), 1, 100, 0)
+
+    assert sorted(labels.tolist()) == list(range(len(xy)))
+
+
+def test_duplicate_points():
+    xy = np.ascontiguousarray(np.tile([[37.0, -122.0]], (10, 1)), dtype=np.float32)
+    labels, centers = kmeans_2d(xy, 3, 2, 100, 0)
+
+    assert ((labels >= 0) & (labels < 3)).all()
+    assert np.isfinite(centers).all()
+
+
+def test_group_close_coordinates_rejects_non_positive_clusters():
+    df = pd.DataFrame(
+        {
+            "cluster_id": np.nan,
+            "group_key": None,
+            "pickup_latitude": [37.0, 37.1],
+            "pickup_longitude": [-122.0, -122.1],
+        }
+    )
+
+    with pytest.raises(ValueError):
+        group_close_coordinates(df, n_clusters=0)